@@ -3,6 +3,8 @@ import pandas as pd
 import matplotlib.pyplot as plt
 import io
 import re
+import hashlib
+from utils import coerce_numeric_columns, suggest_header_row, cached_node
 
 def sanitize_column(col, i):
     if pd.isna(col) or str(col).strip() == "":
@@ -11,6 +13,13 @@ def sanitize_column(col, i):
     col = re.sub(r"[^\w\s]", "_", col)  # Replaces special characters with underscores
     return col if col else f"Unnamed_{i}"
 
+def suggest_column_types(df):
+    # Typ-Vorschlag
+    return {
+        col: "numerical" if pd.api.types.is_numeric_dtype(df[col]) and df[col].nunique() > 10 else "categorical"
+        for col in df.columns
+    }
+
 st.set_page_config(page_title="NoCodeExplorer", layout="wide")
 st.title("📊 NoCodeExplorer – PODSV Project")
 st.subheader("Introduction")
@@ -55,10 +64,16 @@ else:
 # === STEP 1: Upload & Sheet Auswahl ===
 if uploaded_file: # and "raw_df" not in st.session_state:
     sheet = None
+    # Hash of the file content, computed once per upload. All cached results (raw and cleaned data,
+    # filtered views, correlations, plots) are derived from this version token.
+    file_hash, _ = cached_node(
+        "file_hash", (uploaded_file.file_id,),
+        lambda: hashlib.sha1(uploaded_file.getvalue()).hexdigest(), max_entries=1
+    )
 
     # --- Vorschau für Excel ---
     if uploaded_file.name.endswith(".xlsx"):
-        xls = pd.ExcelFile(uploaded_file)
+        xls, _ = cached_node("excel_file", (file_hash,), lambda: pd.ExcelFile(uploaded_file), max_entries=1)
 
         # Sheet-Auswahl speichern
         if st.session_state["selected_sheet"] not in xls.sheet_names:
@@ -70,7 +85,10 @@ if uploaded_file: # and "raw_df" not in st.session_state:
             index=xls.sheet_names.index(st.session_state["selected_sheet"])
         )
         sheet = st.session_state["selected_sheet"]
-        raw_df = pd.read_excel(xls, sheet_name=sheet, header=None)
+        raw_df, raw_version = cached_node(
+            "raw_df", (file_hash, sheet),
+            lambda: pd.read_excel(xls, sheet_name=sheet, header=None), max_entries=2
+        )
         st.session_state["raw_df"] = raw_df
         
     elif uploaded_file.name.endswith(".csv"): # and "raw_df" not in st.session_state:
@@ -94,7 +112,12 @@ if uploaded_file: # and "raw_df" not in st.session_state:
         #     value=st.session_state["header_row"], step=1
         # )
         # header_row = st.session_state["header_row"]
-        raw_df = pd.read_csv(io.BytesIO(st.session_state["csv_bytes"]), delimiter=delimiter, header=0)
+        # Read without header, so that the row numbers of the preview match the header row input
+        raw_df, raw_version = cached_node(
+            "raw_df", (file_hash, delimiter),
+            lambda: pd.read_csv(io.BytesIO(st.session_state["csv_bytes"]), delimiter=delimiter, header=None),
+            max_entries=2
+        )
         # raw_df = pd.read_csv(uploaded_file, delimiter=delimiter, header=header_row)
         st.session_state["raw_df"] = raw_df
     # elif uploaded_file.name.endswith(".csv") and "raw_df" in st.session_state:
@@ -111,31 +134,26 @@ if uploaded_file: # and "raw_df" not in st.session_state:
         st.subheader("📄 Preview of raw data")
         st.dataframe(raw_df.head(30))
         max_header = len(raw_df) - 1
+        # Header-Zeile automatisch vorschlagen (scores the first 50 rows of the raw data, no re-reading of the file)
+        suggested_header, _ = cached_node("header_suggestion", (raw_version,), lambda: suggest_header_row(raw_df))
+        # Only pre-select the suggestion for a new file, sheet or delimiter, so manual changes are kept
+        if st.session_state.get("header_suggested_for") != raw_version:
+            st.session_state["header_row"] = suggested_header
+            st.session_state["header_suggested_for"] = raw_version
+        st.caption(f"💡 Suggested header row: **{suggested_header}** (detected automatically, you can change it if it is not correct)")
         st.session_state["header_row"] = st.number_input(
             "Header Row (starting at 0)", 
             min_value=0, max_value=max_header, 
             value=st.session_state["header_row"], step=1
         )
         header_row = st.session_state["header_row"]
-        # Bedingung: Nur wenn die Header-Zeile geändert wird, dann auch die Typen zurücksetzen
-        if "last_header_row" not in st.session_state:
-            st.session_state["last_header_row"] = header_row
-        if header_row != st.session_state["last_header_row"]:
-            # Alte Typ-Auswahl-Widgets löschen, weil sich die Spalten geändert haben
-            for key in list(st.session_state.keys()):
-                if key.startswith("col_type_"):
-                    del st.session_state[key]
-            # Typen zurücksetzen
-            if "column_types" in st.session_state:
-                del st.session_state["column_types"]
-            st.session_state["last_header_row"] = header_row
     # else:
     #     st.subheader("📄 Preview of raw data")
     #     st.dataframe(raw_df.head(30))
     
 
     # === STEP 3: Einlesen mit Header ===
-    try:
+    def read_clean_data():
         if uploaded_file.name.endswith(".xlsx"):
             df = pd.read_excel(xls, sheet_name=sheet, header=header_row)
             # Cleaning Excel DataFrame
@@ -151,9 +169,18 @@ if uploaded_file: # and "raw_df" not in st.session_state:
             # Cleaning CSV DataFrame
             df.dropna(how='all', axis=0, inplace=True)
             df.dropna(how='all', axis=1, inplace=True)
+
+        # Convert text columns with locale formatted numbers (e.g. "1'234.50", "3,5", "12 %", "CHF 7800")
+        return coerce_numeric_columns(df)
+
+    try:
+        # Only re-read if the file, sheet/delimiter or header row changed
+        (df, coercion_report), df_version = cached_node("clean_df", (raw_version, header_row), read_clean_data, max_entries=2)
             
         # Speichern in Session
         st.session_state["df"] = df
+        # Version of the dataset, used by the other pages to cache their results
+        st.session_state["df_version"] = df_version
 
         st.success(f"✅ File read successfully (Header Row: {header_row}, Sheet: {sheet if sheet else 'CSV'})")
         # === STEP 4: Bereinigte Datenvorschau ===
@@ -169,6 +196,16 @@ if uploaded_file: # and "raw_df" not in st.session_state:
         # Display cleaned DataFrame
         # st.write(df.shape[0], "rows and", df.shape[1], "columns")
         st.dataframe(df.head(30))
+        if not coercion_report.empty:
+            st.markdown("#### 🔢 Converted number formats")
+            st.markdown("""
+The following columns contained numbers stored as text (e.g. with thousands separators, decimal commas, percent signs or currencies) and have been converted to numbers.  
+**Unparsed values** are entries that could not be read as a number, they are treated as missing values.
+""")
+            st.dataframe(coercion_report.set_index("Column"))
+            unparsed = coercion_report.loc[coercion_report["Unparsed values"] > 0, "Column"].tolist()
+            if unparsed:
+                st.warning(f"⚠️ Some values could not be converted in: {', '.join(unparsed)}")
         st.download_button(label="Download cleaned data as CSV", 
                                data=df.to_csv(), 
                                file_name="clean_data.csv", 
@@ -237,38 +274,28 @@ At the end, you can see a **summary** of the assigned types.
 
         #     spalten_typen[col] = selected_type
         # st.session_state["column_types"] = spalten_typen
-        if not any(f"col_type_{col}" in st.session_state for col in df.columns):
-            # st.session_state["column_types"] = {}
-
-            for col in df.columns:
-                series = df[col]
-    
-                # Typ-Vorschlag
-                if pd.api.types.is_numeric_dtype(series) and series.nunique() > 10:
-                    detected_type = "numerical"
-                else:
-                    detected_type = "categorical"
-
-                # Standardwert beim ersten Auftauchen setzen
-                if f"col_type_{col}" not in st.session_state:
-                    st.session_state[f"col_type_{col}"] = detected_type
-            
-            st.session_state["column_types"] = {
-                col: st.session_state[f"col_type_{col}"] for col in df.columns
-            }
+        # Type suggestions are only computed once per dataset version
+        detected_types, _ = cached_node("type_suggestions", (df_version,), lambda: suggest_column_types(df))
+        # The widget keys contain the dataset version, so the selections of an old file, sheet or
+        # header row are never reused for new columns
+        type_key = f"col_type_{df_version}_"
+        for col in df.columns:
+            # Standardwert beim ersten Auftauchen setzen
+            if f"{type_key}{col}" not in st.session_state:
+                st.session_state[f"{type_key}{col}"] = detected_types[col]
 
         for col in df.columns:
             selected_type = st.selectbox(
                 f"Column '{col}' as:",
                 options=["numerical", "categorical"],
-                index=0 if st.session_state[f"col_type_{col}"] == "numerical" else 1,
-                key=f"col_type_{col}"
+                index=0 if st.session_state[f"{type_key}{col}"] == "numerical" else 1,
+                key=f"{type_key}{col}"
             )
 
             # Speichern aktuelle Auswahl
             # st.session_state["column_types"][col] = selected_type
         st.session_state["column_types"] = {
-            col: st.session_state[f"col_type_{col}"] for col in df.columns
+            col: st.session_state[f"{type_key}{col}"] for col in df.columns
         }
 
 
@@ -4,6 +4,7 @@ import matplotlib.pyplot as plt
 import numpy as np
 import pandas as pd
 import io
+from utils import filter_controls, filtered_view, cached_node, correlation_matrix, interpret_corr, CORRELATION_METHODS
 
 st.title("🧮 Correlation Analysis")
 st.markdown(
@@ -37,6 +38,7 @@ with st.expander("**ℹ️ What does correlation mean?**"):
 if "df" in st.session_state:
     # Load DataFrame from session state
     df = st.session_state["df"]
+    df_version = st.session_state["df_version"]
     # Load column types from session state
     column_types = st.session_state["column_types"]
     # Select only numeric columns
@@ -72,33 +74,36 @@ if "df" in st.session_state:
                               [None] + list(df.columns), 
                               format_func=lambda x: "None" if x is None else x
                               )
-    # Filter DataFrame even if no filter is selected
-    df_filtered = df
-    # Apply filter if a filter column is selected
-    if filter_col is not None:
-        # Check if the selected filter column is numerical or categorical
-        # and apply the appropriate filter
-        # If the filter column is numerical, use a slider
-        if column_types[filter_col] == "numerical":
-            min_val = float(df[filter_col].min())
-            max_val = float(df[filter_col].max())
-            range_val = st.slider("Chosse value range", min_val, max_val, (min_val, max_val))
-            df_filtered = df[df[filter_col].between(*range_val)]
-        # If the filter column is categorical, use a multiselect
-        elif column_types[filter_col] == "categorical":
-            options = sorted(df[filter_col].dropna().unique().tolist())
-            selected = st.multiselect("Choose a category (multiple possible)", options, default=options)
-            df_filtered = df[df[filter_col].isin(selected)]
+    # Show slider or multiselect for the filter column (bounds and categories are cached per dataset version)
+    filter_state = filter_controls(df, df_version, filter_col, column_types.get(filter_col))
+    # The filtered view is cached per (dataset version, filter state) and shared with the other pages
+    df_filtered, view_version = filtered_view(df, df_version, filter_state)
+    # Select correlation method
+    method = st.selectbox("Correlation method", list(CORRELATION_METHODS),
+                          format_func=lambda x: CORRELATION_METHODS[x])
+    with st.expander("**ℹ️ Which correlation method should I use?**"):
+        st.markdown("""
+    - **Pearson** measures the strength of a **linear** relationship. It is sensitive to outliers.
+    - **Spearman** uses the ranks of the values and measures a **monotonic** relationship (the variables move in the same direction, but not necessarily in a straight line). It is robust against outliers.
+    - **Kendall** also uses ranks and compares all pairs of observations. It is well suited for small samples and data with many equal values (ties).
+
+    The **p-value** tells you how likely such a correlation would appear by chance if there was no correlation at all. A p-value below 0.05 is usually called **significant**.  
+    The **95% confidence interval** is the range in which the true correlation lies with 95% confidence.
+    """)
+
     # num_df = df.select_dtypes(include="number")
     # Check if there are at least two numeric columns
     if len(numeric_cols) >= 2:
         # Check if at least two columns are selected
         if len(selected_cols) >= 2:
-            st.subheader("📈 Correlation Matrix")
-            # Only keep selected columns
-            df_selected = df_filtered[selected_cols]
+            st.subheader(f"📈 Correlation Matrix ({CORRELATION_METHODS[method]})")
             # Calculate the correlation matrix
-            corr = df_selected.corr()
+            # The matrix is computed once per filtered view, columns and method
+            # (the ranks for Spearman and Kendall are computed once per column and reused for all pairs)
+            (corr, pairs), _ = cached_node(
+                "correlation_matrix", (view_version, tuple(selected_cols), method),
+                lambda: correlation_matrix(df_filtered, view_version, selected_cols, method)
+            )
             # Display the correlation matrix
             fig, ax = plt.subplots(figsize=(12, 10))
 
@@ -135,6 +140,24 @@ if "df" in st.session_state:
                                data=buf, 
                                file_name="correlation_graph.png", 
                                mime="image/png")
+
+            # Significance of every pair of variables
+            st.subheader("🔍 Significance and confidence intervals")
+            pairs_result = pd.DataFrame({
+                "Variable 1": pairs["Variable 1"],
+                "Variable 2": pairs["Variable 2"],
+                "Correlation": pairs["r"].round(4),
+                "95% CI": [f"[{lo:.3f}, {hi:.3f}]" for lo, hi in zip(pairs["ci_low"], pairs["ci_high"])],
+                "p-value": pairs["p"],
+                "n": pairs["n"],
+                "Interpretation": [interpret_corr(r) for r in pairs["r"]],
+                "Significant (p < 0.05)": pairs["p"] < 0.05,
+            })
+            st.dataframe(pairs_result, use_container_width=True, hide_index=True)
+            st.download_button(label="Download Significance Table as CSV", 
+                               data=pairs_result.to_csv(index=False), 
+                               file_name="correlation_significance.csv", 
+                               mime="text/csv")
         # Warning if not enough columns are selected
         else:
             st.warning("Please select at least two columns for correlation analysis.")
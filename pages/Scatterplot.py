@@ -2,6 +2,8 @@ import streamlit as st
 import pandas as pd
 import plotly.express as px
 import numpy as np
+from utils import (filter_controls, filtered_view, cached_node, column_ranks, correlation_test, interpret_corr,
+                   numeric_values, CORRELATION_METHODS)
 
 st.header("📈 Scatterplot with color coding")
 st.markdown("""
@@ -28,21 +30,6 @@ with st.expander("**ℹ️ What is a scatterplot?**"):
     They are especially useful to spot trends or outliers.
     """)
 
-def interpret_corr(corr):
-    if corr >= 0.75:
-        return "Strong positive correlation"
-    elif corr >= 0.5:
-        return "Moderate positive correlation"
-    elif corr >= 0.25:
-        return "Weak positive correlation"
-    elif corr > -0.25:
-        return "No correlation"
-    elif corr >= -0.5:
-        return "Weak negative correlation"
-    elif corr >= -0.75:
-        return "Moderate negative correlation"
-    else:
-        return "Strong negative correlation"
 # Navigation sidebar
 # st.sidebar.page_link("Home.py", label="Home", icon="🏠")
 # st.sidebar.page_link("Univariate.py", label="Univariate Analysis", icon="📏")
@@ -62,6 +49,7 @@ if "df" not in st.session_state:
     st.stop()
 # Load DataFrame and Column Types from Session State
 df = st.session_state["df"]
+df_version = st.session_state["df_version"]
 col_types = st.session_state.get("column_types", {})
 # Load column types from session state
 column_types = st.session_state["column_types"]
@@ -105,47 +93,55 @@ filter_col = st.selectbox("Filter using another Variable (optional)",
                               [None] + list(df.columns), 
                               format_func=lambda x: "None" if x is None else x
                               )
-    # Filter DataFrame even if no filter is selected
-df_filtered = df
 # if filter_col:
 #     unique_vals = df[filter_col].dropna().unique()
 #     selected_vals = st.multiselect("Filterwerte auswählen", unique_vals, default=unique_vals)
 #     filtered_df = df[df[filter_col].isin(selected_vals)]
-if filter_col is not None:
-        # Check if the selected filter column is numerical or categorical
-        # and apply the appropriate filter
-        # If the filter column is numerical, use a slider
-        if column_types[filter_col] == "numerical":
-            min_val = float(df[filter_col].min())
-            max_val = float(df[filter_col].max())
-            range_val = st.slider("Choose value range", min_val, max_val, (min_val, max_val))
-            df_filtered = df[df[filter_col].between(*range_val)]
-        # If the filter column is categorical, use a multiselect
-        elif column_types[filter_col] == "categorical":
-            options = sorted(df[filter_col].dropna().unique().tolist())
-            selected = st.multiselect("Choose a category (multiple possible)", options, default=options)
-            df_filtered = df[df[filter_col].isin(selected)]
-# Scatterplot mit Plotly
-fig = px.scatter(
-    df_filtered,
-    x=x_col,
-    y=y_col,
-    color=color_col,
-    title=f"Scatterplot: {x_col} vs {y_col}"
+# Slider bounds and sorted categories are cached per dataset version
+filter_state = filter_controls(df, df_version, filter_col, column_types.get(filter_col))
+# Filter DataFrame even if no filter is selected (cached per dataset version and filter state)
+df_filtered, view_version = filtered_view(df, df_version, filter_state)
+# Scatterplot mit Plotly (only rebuilt if the filtered view or the variables change)
+fig, _ = cached_node(
+    "scatterplot", (view_version, x_col, y_col, color_col),
+    lambda: px.scatter(
+        df_filtered,
+        x=x_col,
+        y=y_col,
+        color=color_col,
+        title=f"Scatterplot: {x_col} vs {y_col}"
+    )
 )
 
 st.plotly_chart(fig, use_container_width=True)
 
-x_col = df_filtered[x_col]
-y_col = df_filtered[y_col]
-# Correlation
-correlation = x_col.corr(y_col)
+# Correlation method
+method = st.selectbox("Correlation method", list(CORRELATION_METHODS),
+                      format_func=lambda x: CORRELATION_METHODS[x])
+def compute_correlation():
+    # Ranks are cached per filtered view and column, so switching the variables or the method does not re-rank
+    x_ranks = y_ranks = None
+    if method != "pearson":
+        x_ranks = column_ranks(df_filtered, view_version, x_col)
+        y_ranks = column_ranks(df_filtered, view_version, y_col)
+    return correlation_test(numeric_values(df_filtered[x_col]), numeric_values(df_filtered[y_col]),
+                            method, x_ranks, y_ranks)
+
+# Correlation with p-value and confidence interval
+result, _ = cached_node("scatter_correlation", (view_version, x_col, y_col, method), compute_correlation, max_entries=16)
+correlation = result["r"]
 # Interpretation
 interpretation = interpret_corr(correlation)
+if result["p"] >= 0.05:
+    interpretation += " (not significant)"
 
 # Correlation Interpretation DataFrame
 df_result = pd.DataFrame({
+    "Method": [CORRELATION_METHODS[method]],
     "Correlation": [f"{correlation:.4f}"],
+    "95% CI": [f"[{result['ci_low']:.3f}, {result['ci_high']:.3f}]"],
+    "p-value": [f"{result['p']:.4g}"],
+    "n": [result["n"]],
     "Interpretation": [interpretation]
 })
 # Styling für DataFrame
@@ -168,6 +164,10 @@ It ranges from **-1** (perfect negative) to **+1** (perfect positive):
 - **Negative correlation**: As one variable increases, the other tends to decrease.
 - **Zero correlation**: No linear relationship.
 
+**Spearman** and **Kendall** use the ranks of the values instead of the values themselves. They measure if the variables move in the same direction (monotonic relationship), even if it is not a straight line, and are less sensitive to outliers.
+
+The **p-value** tells you how likely such a correlation would appear by chance if there was no correlation at all, values below 0.05 are called **significant**. The **95% CI** (confidence interval) is the range in which the true correlation lies with 95% confidence, and **n** is the number of observations used.
+
 Keep in mind: Correlation does **not** imply causation.
 """)
 
@@ -2,6 +2,8 @@ import streamlit as st
 import pandas as pd
 import matplotlib.pyplot as plt
 import plotly.express as px
+import plotly.graph_objects as go
+from utils import filter_controls, filtered_view, cached_node, grouped_summary, grouped_histogram, grouped_box_stats
 
 st.header("📏 Univariate analysis – Numerical Variables")
 st.markdown("""
@@ -14,6 +16,7 @@ You can:
 - See **quantile statistics** (min, Q1, median, Q3, max)
 - Explore the **distribution visually** via a histogram
 - Identify potential **outliers** using a boxplot
+- (Optionally) **split** the variable by a categorical variable to compare the groups side by side
 
 With the functionality of plotly you can do the following with the plots:
 - **Hover**: Hover over points to see their values.
@@ -42,6 +45,7 @@ if "df" not in st.session_state:
     st.stop()
 
 df = st.session_state["df"]
+df_version = st.session_state["df_version"]
 # Numerische Spalten filtern
 # num_cols = df.select_dtypes(include="number").columns.tolist()
 # col_types = st.session_state.get("column_types", {})
@@ -80,24 +84,76 @@ filter_col = st.selectbox("Filter using another Variable (optional)",
                               format_func=lambda x: "None" if x is None else x
                               )
 
-df_filtered = df
-
-if filter_col is not None:
-        # Check if the selected filter column is numerical or categorical
-        # and apply the appropriate filter
-        # If the filter column is numerical, use a slider
-        if column_types[filter_col] == "numerical":
-            min_val = float(df[filter_col].min())
-            max_val = float(df[filter_col].max())
-            range_val = st.slider("Choose value range", min_val, max_val, (min_val, max_val))
-            df_filtered = df[df[filter_col].between(*range_val)]
-        # If the filter column is categorical, use a multiselect
-        elif column_types[filter_col] == "categorical":
-            options = sorted(df[filter_col].dropna().unique().tolist())
-            selected = st.multiselect("Choose a category (multiple possible)", options, default=options)
-            df_filtered = df[df[filter_col].isin(selected)]
-
-if selected_col and selected_col in df.columns:
+# Slider bounds and sorted categories are cached per dataset version
+filter_state = filter_controls(df, df_version, filter_col, column_types.get(filter_col))
+# The filtered view is cached per (dataset version, filter state), its version is used for all results below
+df_filtered, view_version = filtered_view(df, df_version, filter_state)
+
+# Split by categorical variable (optional)
+group_col = st.selectbox("Split by a categorical variable (optional)",
+                         [None] + cat_cols,
+                         format_func=lambda x: "None" if x is None else x
+                         )
+
+# Maximum number of groups which are drawn in the plots
+MAX_PLOT_GROUPS = 20
+
+def compute_grouped(data, selected_col, group_col):
+    summary = grouped_summary(data, selected_col, group_col)
+    edges, counts = grouped_histogram(data, selected_col, group_col, bins=20)
+    box, outliers = grouped_box_stats(data, selected_col, group_col, summary)
+    return summary, edges, counts, box, outliers
+
+if selected_col and selected_col in df.columns and group_col is not None:
+    # All group statistics are computed once per (filtered view, column, grouping column)
+    (summary, edges, counts, box, outliers), _ = cached_node(
+        "grouped_univariate", (view_version, selected_col, group_col),
+        lambda: compute_grouped(df_filtered, selected_col, group_col), max_entries=8
+    )
+    if summary.empty:
+        st.warning("No data left for the selected filter.")
+        st.stop()
+
+    st.subheader(f"📊 Descriptive statistics by {group_col}")
+    with st.expander("**ℹ️ What do grouped statistics tell us?**"):
+        st.markdown("""
+            The statistics are calculated separately for every category of the selected variable.  
+            This makes it easy to compare the groups, for example if one group has a higher mean or a larger spread than the others.
+            - **count, mean, std, min, max**: The descriptive statistics of each group.
+            - **25%, 50%, 75%**: The quartiles of each group (50% is the median).
+            """)
+    st.dataframe(summary)
+
+    # Only the largest groups are drawn, otherwise the plots get unreadable
+    plot_groups = summary["count"].nlargest(MAX_PLOT_GROUPS).index
+    if len(summary) > MAX_PLOT_GROUPS:
+        st.info(f"{group_col} has {len(summary)} categories, the plots show the {MAX_PLOT_GROUPS} largest.")
+
+    st.subheader("📊 Histogram")
+    centers = (edges[:-1] + edges[1:]) / 2
+    # Groups without any value in the selected column have no bins
+    counts = counts.reindex(plot_groups, fill_value=0)
+    fig_hist = go.Figure()
+    for group in plot_groups:
+        fig_hist.add_trace(go.Bar(x=centers, y=counts.loc[group].to_numpy(), width=edges[1:] - edges[:-1],
+                                  name=str(group), opacity=0.6))
+    fig_hist.update_layout(barmode="overlay", title=f"Histogram of {selected_col} by {group_col}",
+                           xaxis_title=selected_col, yaxis_title="count", legend_title=group_col)
+    st.plotly_chart(fig_hist)
+
+    st.subheader("📦 Boxplot")
+    box = box.loc[plot_groups]
+    labels = [str(group) for group in plot_groups]
+    fig_box = go.Figure()
+    fig_box.add_trace(go.Box(x=labels, q1=box["25%"], median=box["50%"], q3=box["75%"], mean=box["mean"],
+                             lowerfence=box["lowerfence"], upperfence=box["upperfence"], name=selected_col))
+    shown_outliers = outliers[outliers[group_col].isin(plot_groups)]
+    fig_box.add_trace(go.Scatter(x=shown_outliers[group_col].astype(str), y=shown_outliers[selected_col],
+                                 mode="markers", name="outliers"))
+    fig_box.update_layout(title=f"Boxplot of {selected_col} by {group_col}",
+                          xaxis_title=group_col, yaxis_title=selected_col)
+    st.plotly_chart(fig_box)
+elif selected_col and selected_col in df.columns:
     # Deskriptive Statistiken
     st.subheader("📊 Descriptive statistics")
     with st.expander("**ℹ️ What do descriptive statistics tell us?**"):
@@ -109,7 +165,17 @@ if selected_col and selected_col in df.columns:
             - **Minimum and maximum**: The smallest and largest values, respectively.
             """)
     # Descriptive statistics without the 25th, 50th and 75th percentiles (since they are shown in the quantile statistics)
-    st.write(df_filtered[selected_col].describe().drop(["25%", "50%", "75%"]))
+    # Statistics and plots are computed once per (filtered view, column)
+    (description, quantiles, fig_hist, fig_box), _ = cached_node(
+        "univariate", (view_version, selected_col),
+        lambda: (
+            df_filtered[selected_col].describe().drop(["25%", "50%", "75%"]),
+            df_filtered[selected_col].quantile([0, 0.25, 0.5, 0.75, 1.0]),
+            px.histogram(df_filtered, x=selected_col, nbins=20, title=f"Histogram of {selected_col}"),
+            px.box(df_filtered, x=selected_col, title=f"Boxplot of {selected_col}", points="outliers"),
+        ), max_entries=8
+    )
+    st.write(description)
     # st.write(df_filtered[selected_col].describe())
 
     # Quantile
@@ -123,7 +189,7 @@ if selected_col and selected_col in df.columns:
             - **75% (Q3)**: The third quartile, which is the median of the upper half of the dataset.
             - **100%**: The maximum value.
             """)
-    st.write(df_filtered[selected_col].quantile([0, 0.25, 0.5, 0.75, 1.0]))
+    st.write(quantiles)
 
     # Histogramm
     # st.subheader("📊 Histogram")
@@ -139,7 +205,6 @@ if selected_col and selected_col in df.columns:
             It divides the data into bins and shows the frequency of data points in each bin.  
             This helps to visualize the **shape**, **spread**, and **central tendency** of the data.
             """)
-    fig_hist = px.histogram(df_filtered, x=selected_col, nbins=20, title=f"Histogram of {selected_col}")
     st.plotly_chart(fig_hist)
 
     # Boxplot
@@ -156,7 +221,6 @@ if selected_col and selected_col in df.columns:
             It displays the median, quartiles (q1 and q3), and potential outliers.  
             The box represents the interquartile range (IQR), while the lines (whiskers) extend to the minimum and maximum values within 1.5 times the IQR.
             """)
-    fig_box = px.box(df_filtered, x=selected_col, title=f"Boxplot of {selected_col}", points="outliers")
     st.plotly_chart(fig_box)
 else:
     st.warning("Please select a numerical variable to analyze.")
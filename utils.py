@@ -0,0 +1,470 @@
+import hashlib
+import math
+import re
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+from scipy import stats
+
+# === Numeric coercion for locale-formatted text columns ===
+# Values like "1'234.50", "3,5", "12 %" or "CHF 7800" are read by pandas as text (object dtype).
+# The format of a column is detected from a small sample, afterwards the whole column is converted
+# with vectorised string operations (no Python loop over the cells).
+
+# Currency prefixes/suffixes that are stripped before parsing
+CURRENCY_PATTERN = r"(?:CHF|EUR|USD|GBP|JPY|Fr\.|SFr\.|[$€£¥])"
+# Tokens which are treated as missing values and not as parse failures
+NA_TOKENS = ["", "-", "--", "na", "n/a", "nan", "null", "none", "#n/a"]
+# Candidate formats as (thousands separator, decimal separator), order is used as tie-break
+NUMBER_FORMATS = [
+    (None, "."),
+    (",", "."),
+    ("'", "."),
+    ("’", "."),
+    (" ", "."),
+    (None, ","),
+    (".", ","),
+    (" ", ","),
+    ("'", ","),
+]
+# Share of the sample that must be parseable so that a column is converted
+MIN_PARSE_RATIO = 0.9
+# Columns where this share of the sample are zero-padded codes (e.g. "00123") are kept as text
+MAX_LEADING_ZERO_RATIO = 0.05
+
+
+def _number_regex(thousands, decimal):
+    dec = re.escape(decimal)
+    if thousands is None:
+        return rf"[+-]?(?:\d+(?:{dec}\d+)?|{dec}\d+)"
+    sep = re.escape(thousands)
+    # Thousands separators are only accepted in groups of exactly three digits
+    return rf"[+-]?(?:\d{{1,3}}(?:{sep}\d{{3}})+|\d+)(?:{dec}\d+)?"
+
+
+def _strip_affixes(series):
+    # Removes whitespace, currency symbols and percent signs in one vectorised pass
+    s = series.astype("string").str.strip()
+    s = s.str.replace(rf"^{CURRENCY_PATTERN}\s*|\s*{CURRENCY_PATTERN}$", "", regex=True)
+    s = s.str.replace(r"\s*%$", "", regex=True)
+    # Non-breaking/narrow spaces are used as thousands separators in some exports
+    s = s.str.replace("\u00a0", " ", regex=False).str.replace("\u202f", " ", regex=False)
+    return s.str.strip()
+
+
+def _missing_mask(stripped):
+    return stripped.isna() | stripped.str.lower().isin(NA_TOKENS)
+
+
+def _parse(stripped, thousands, decimal):
+    # Only values matching the full pattern are parsed, everything else becomes NaN
+    valid = stripped.str.fullmatch(_number_regex(thousands, decimal)).fillna(False).astype(bool)
+    s = stripped.where(valid)
+    if thousands is not None:
+        s = s.str.replace(thousands, "", regex=False)
+    if decimal != ".":
+        s = s.str.replace(decimal, ".", regex=False)
+    return pd.to_numeric(s, errors="coerce")
+
+
+def detect_number_format(series, sample_size=500):
+    """Returns (thousands, decimal, parse ratio) for the best matching format of a text column, or None."""
+    values = series.dropna()
+    if values.empty:
+        return None
+    sample = _strip_affixes(values.sample(min(sample_size, len(values)), random_state=0))
+    sample = sample[~_missing_mask(sample)]
+    if sample.empty:
+        return None
+    # Postal codes or article numbers would lose their leading zeros
+    if sample.str.fullmatch(r"0\d+").fillna(False).mean() > MAX_LEADING_ZERO_RATIO:
+        return None
+
+    best = None
+    for thousands, decimal in NUMBER_FORMATS:
+        ratio = _parse(sample, thousands, decimal).notna().mean()
+        # Strictly greater, so that earlier (more common) formats win ties
+        if best is None or ratio > best[2]:
+            best = (thousands, decimal, ratio)
+    if best[2] < MIN_PARSE_RATIO:
+        return None
+    return best
+
+
+def coerce_numeric(series, thousands, decimal):
+    """Converts a whole text column with the given format, returns (numeric series, number of unparsed values)."""
+    stripped = _strip_affixes(series)
+    missing = _missing_mask(stripped)
+    numeric = _parse(stripped, thousands, decimal).astype("float64")
+    failed = int((numeric.isna() & ~missing).sum())
+    return numeric, failed
+
+
+def coerce_numeric_columns(df, sample_size=500):
+    """Converts all text columns that look numeric, returns (new df, report df)."""
+    df = df.copy()
+    report = []
+    for col in df.columns:
+        series = df[col]
+        if not (pd.api.types.is_object_dtype(series) or pd.api.types.is_string_dtype(series)):
+            continue
+        fmt = detect_number_format(series, sample_size=sample_size)
+        if fmt is None:
+            continue
+        thousands, decimal, _ = fmt
+        numeric, failed = coerce_numeric(series, thousands, decimal)
+        df[col] = numeric
+        report.append({
+            "Column": col,
+            "Thousands separator": "none" if thousands is None else repr(thousands),
+            "Decimal separator": repr(decimal),
+            "Unparsed values": failed,
+        })
+    report_df = pd.DataFrame(report, columns=["Column", "Thousands separator", "Decimal separator", "Unparsed values"])
+    return df, report_df
+
+
+# === Header row detection ===
+# Scores the first rows of the raw data (read without header) in one pass over boolean cell masks.
+# A good header row is well filled, mostly text, has unique values and is followed by rows
+# where the same columns contain numbers.
+
+def suggest_header_row(raw_df, max_rows=50, lookahead=10):
+    """Returns the position of the most likely header row in raw_df."""
+    block = raw_df.head(max_rows)
+    if block.empty or block.shape[1] == 0:
+        return 0
+    n_cols = block.shape[1]
+    filled = block.notna()
+    numeric = block.apply(pd.to_numeric, errors="coerce").notna()
+    text = filled & ~numeric
+
+    fill_ratio = filled.sum(axis=1) / n_cols
+    text_density = text.sum(axis=1) / n_cols
+    uniqueness = block.nunique(axis=1) / filled.sum(axis=1).clip(lower=1)
+    # Share of numeric cells in the next rows of every column (the row itself is excluded by the shift)
+    numeric_below = (
+        numeric.astype(float).iloc[::-1]
+        .rolling(lookahead, min_periods=1).mean()
+        .iloc[::-1].shift(-1).fillna(0)
+    )
+    type_change = (text & (numeric_below > 0.5)).sum(axis=1) / n_cols
+
+    score = text_density + uniqueness * fill_ratio + 2 * type_change
+    # Title or note rows above the table are only partly filled
+    score[fill_ratio < 0.5 * fill_ratio.max()] = -np.inf
+    return int(np.argmax(score.to_numpy()))
+
+
+# === Dataset versioning and cached results ===
+# Every derived result (raw frame, cleaned frame, filtered view, ranks, correlation matrix, plot data, ...)
+# is a node with a version token. The token is computed from the tokens of the inputs of the node
+# (file hash -> sheet/delimiter -> header row -> filter state -> ...), so a changed input changes the
+# tokens of all results that depend on it, while all other results keep their token and are reused.
+# The results are stored per session in st.session_state, a few versions per node.
+
+def make_token(*parts):
+    return hashlib.sha1(repr(parts).encode()).hexdigest()[:16]
+
+
+def cached_node(name, deps, compute, max_entries=4):
+    """Returns (result, token) of the node, compute() is only called if no result exists for these dependencies."""
+    token = make_token(name, *deps)
+    cache = st.session_state.setdefault("node_cache", {}).setdefault(name, OrderedDict())
+    if token in cache:
+        cache.move_to_end(token)
+    else:
+        cache[token] = compute()
+        # Drop the least recently used versions
+        while len(cache) > max_entries:
+            cache.popitem(last=False)
+    return cache[token], token
+
+
+# === Filtering ===
+# A filter state is either None, (column, "range", (min, max)) or (column, "in", (value, ...)).
+# It is hashable, so it can be used as part of a cache key.
+
+# Categorical columns with more distinct values get a searchable, paged selection
+HIGH_CARDINALITY = 500
+# Number of categories shown per page in the paged selection
+PAGE_SIZE = 100
+
+
+def as_numeric(series):
+    # Columns which were manually set to numerical can still contain text, it becomes NaN
+    if pd.api.types.is_numeric_dtype(series):
+        return series
+    return pd.to_numeric(series, errors="coerce")
+
+
+def apply_filter(df, filter_state):
+    if filter_state is None:
+        return df
+    col, kind, value = filter_state
+    if kind == "range":
+        return df[as_numeric(df[col]).between(*value)]
+    return df[df[col].isin(value)]
+
+
+def filtered_view(df, df_version, filter_state):
+    """Returns (filtered DataFrame, view version), shared by all pages using the same filter."""
+    return cached_node("filtered_view", (df_version, filter_state), lambda: apply_filter(df, filter_state))
+
+
+# The metadata is cached per dataset version and column, the DataFrame itself is not hashed (leading underscore)
+@st.cache_data(show_spinner=False, max_entries=256)
+def numeric_bounds(_df, version, col):
+    series = as_numeric(_df[col])
+    return float(series.min()), float(series.max())
+
+
+# cache_resource returns the same Series on every rerun instead of unpickling a copy,
+# which matters for columns with hundreds of thousands of categories (the Series is never modified)
+@st.cache_resource(show_spinner=False, max_entries=256)
+def sorted_categories(_df, version, col):
+    # Kept as a pandas Series, so that e.g. dates stay Timestamps (and match with isin) after tolist()
+    values = pd.Series(_df[col].dropna().unique())
+    try:
+        return values.sort_values(ignore_index=True)
+    except TypeError:
+        # Mixed types (e.g. numbers and text) are sorted by their text representation
+        order = np.argsort(values.astype(str).to_numpy(), kind="stable")
+        return values.iloc[order].reset_index(drop=True)
+
+
+def _paged_multiselect(values, col, key, version):
+    # Only one page of categories is sent to the browser, the selection is kept across pages and searches.
+    # The dataset version is part of the key, so a selection never carries over to a new file
+    selected_key = f"{key}_{version}_selected"
+    if selected_key not in st.session_state:
+        st.session_state[selected_key] = []
+    st.caption(f"'{col}' has {len(values):,} categories. Search and select the categories you want to keep, "
+               "without a selection all rows are used.")
+    search = st.text_input("Search categories", key=f"{key}_search")
+    if search:
+        matches = values[values.astype(str).str.contains(search, case=False, regex=False)]
+    else:
+        matches = values
+    n_pages = max(1, math.ceil(len(matches) / PAGE_SIZE))
+    page = 1
+    if n_pages > 1:
+        page = st.number_input(f"Page (1–{n_pages}, {len(matches):,} matching categories)",
+                               min_value=1, max_value=n_pages, value=1, step=1, key=f"{key}_page")
+    page_values = matches.iloc[(page - 1) * PAGE_SIZE:page * PAGE_SIZE].tolist()
+    # The multiselect has a stable key per page and search, its options never depend on the selection.
+    # Its value is merged into the stored selection in the callback, so no click is lost on the next rerun.
+    select_key = f"{key}_{version}_select_{page}_{search}"
+    if select_key not in st.session_state:
+        stored = set(st.session_state[selected_key])
+        st.session_state[select_key] = [value for value in page_values if value in stored]
+
+    def merge_selection():
+        page_set = set(page_values)
+        kept = [value for value in st.session_state[selected_key] if value not in page_set]
+        st.session_state[selected_key] = kept + st.session_state[select_key]
+
+    st.multiselect("Choose a category (multiple possible)", page_values, key=select_key, on_change=merge_selection)
+    selected = st.session_state[selected_key]
+    if selected:
+        st.caption(f"{len(selected):,} categories selected in total.")
+    return selected
+
+
+def filter_controls(df, version, filter_col, column_type):
+    """Shows the slider or multiselect for filter_col and returns the selected filter state."""
+    if filter_col is None:
+        return None
+    key = f"filter_{filter_col}"
+    # If the filter column is numerical, use a slider
+    if column_type == "numerical":
+        min_val, max_val = numeric_bounds(df, version, filter_col)
+        if np.isnan(min_val) or min_val == max_val:
+            st.info(f"'{filter_col}' has only one value, there is nothing to filter.")
+            return None
+        range_val = st.slider("Choose value range", min_val, max_val, (min_val, max_val), key=key)
+        return (filter_col, "range", tuple(range_val))
+    # If the filter column is categorical, use a multiselect
+    options = sorted_categories(df, version, filter_col)
+    if len(options) > HIGH_CARDINALITY:
+        selected = _paged_multiselect(options, filter_col, key, version)
+        return (filter_col, "in", tuple(selected)) if selected else None
+    options = options.tolist()
+    selected = st.multiselect("Choose a category (multiple possible)", options, default=options, key=key)
+    return (filter_col, "in", tuple(selected))
+
+
+# === Grouped univariate statistics ===
+# All statistics are computed on one groupby object, so the grouping is only done once.
+
+SUMMARY_COLUMNS = ["count", "mean", "std", "min", "25%", "50%", "75%", "max"]
+
+
+def _group_data(df, col, group_col):
+    data = df[[col, group_col]]
+    if not pd.api.types.is_numeric_dtype(data[col]):
+        data = data.copy()
+        data[col] = as_numeric(data[col])
+    return data
+
+
+def _finite_group_data(df, col, group_col):
+    # Rows used for the plots, infinite values (e.g. "inf" in a CSV) can not be binned or drawn
+    data = _group_data(df, col, group_col).dropna()
+    return data[np.isfinite(data[col])]
+
+
+def grouped_summary(df, col, group_col):
+    """Count, mean, std, min/max and quartiles of col for every category of group_col."""
+    grouped = _group_data(df, col, group_col).dropna(subset=[group_col]).groupby(group_col, observed=True)[col]
+    summary = grouped.agg(["count", "mean", "std", "min", "max"])
+    # reindex keeps the three columns even if there are no groups (e.g. everything filtered out)
+    quartiles = grouped.quantile([0.25, 0.5, 0.75]).unstack().reindex(columns=[0.25, 0.5, 0.75])
+    quartiles.columns = ["25%", "50%", "75%"]
+    return summary.join(quartiles)[SUMMARY_COLUMNS]
+
+
+def grouped_histogram(df, col, group_col, bins=20):
+    """Bins col with shared bin edges and counts per category, returns (edges, counts per group and bin)."""
+    data = _finite_group_data(df, col, group_col)
+    values = data[col].to_numpy(dtype=float)
+    edges = np.histogram_bin_edges(values, bins=bins)
+    # The last edge belongs to the last bin (same as numpy.histogram)
+    codes = np.clip(np.searchsorted(edges, values, side="right") - 1, 0, bins - 1)
+    counts = (
+        data.groupby([data[group_col], codes], observed=True).size()
+        .unstack(fill_value=0)
+        .reindex(columns=range(bins), fill_value=0)
+    )
+    return edges, counts
+
+
+def grouped_box_stats(df, col, group_col, summary):
+    """Whiskers (1.5 * IQR) and outliers per category, based on the quartiles of grouped_summary."""
+    data = _finite_group_data(df, col, group_col)
+    groups = data[group_col]
+    values = data[col]
+    iqr = summary["75%"] - summary["25%"]
+    # Map the fences of each group back to the rows, so the comparison runs vectorised
+    low = groups.map(summary["25%"] - 1.5 * iqr)
+    high = groups.map(summary["75%"] + 1.5 * iqr)
+    inside = values.between(low, high)
+    box = summary[["25%", "50%", "75%", "mean"]].copy()
+    box["lowerfence"] = values[inside].groupby(groups[inside], observed=True).min()
+    box["upperfence"] = values[inside].groupby(groups[inside], observed=True).max()
+    outliers = data.loc[~inside, [group_col, col]]
+    return box, outliers
+
+
+# === Correlation ===
+# Spearman and Kendall only depend on the ranks of the values. The ranks of a column are computed
+# once per filtered view (dataset version and filter state) and reused for every pair the column is part of.
+
+CORRELATION_METHODS = {"pearson": "Pearson", "spearman": "Spearman", "kendall": "Kendall"}
+# Standard errors of the Fisher z transformed coefficient (Fieller, Hartley & Pearson, 1957)
+FISHER_SE_FACTOR = {"pearson": 1.0, "spearman": 1.06, "kendall": 0.437}
+FISHER_SE_OFFSET = {"pearson": 3, "spearman": 3, "kendall": 4}
+
+
+def interpret_corr(corr):
+    if pd.isna(corr):
+        return "Not enough data"
+    elif corr >= 0.75:
+        return "Strong positive correlation"
+    elif corr >= 0.5:
+        return "Moderate positive correlation"
+    elif corr >= 0.25:
+        return "Weak positive correlation"
+    elif corr > -0.25:
+        return "No correlation"
+    elif corr >= -0.5:
+        return "Weak negative correlation"
+    elif corr >= -0.75:
+        return "Moderate negative correlation"
+    else:
+        return "Strong negative correlation"
+
+
+def numeric_values(series):
+    return as_numeric(series).to_numpy(dtype=float)
+
+
+def rank_values(values):
+    """Average ranks (ties get the mean of their ranks) with one argsort, NaN stays NaN."""
+    ranks = np.full(len(values), np.nan)
+    valid = ~np.isnan(values)
+    x = values[valid]
+    if len(x) == 0:
+        return ranks
+    order = np.argsort(x, kind="mergesort")
+    sorted_x = x[order]
+    # Every block of equal values gets the mean of the positions start+1 ... end
+    new_block = np.r_[True, sorted_x[1:] != sorted_x[:-1]]
+    starts = np.flatnonzero(new_block)
+    ends = np.r_[starts[1:], len(x)]
+    block_ranks = (starts + 1 + ends) / 2
+    x_ranks = np.empty(len(x))
+    x_ranks[order] = block_ranks[np.cumsum(new_block) - 1]
+    ranks[valid] = x_ranks
+    return ranks
+
+
+def column_ranks(df, view_version, col):
+    """Ranks of a column of the filtered view, computed once per view version and column."""
+    ranks, _ = cached_node("ranks", (view_version, col), lambda: rank_values(numeric_values(df[col])), max_entries=64)
+    return ranks
+
+
+def correlation_test(x, y, method, x_ranks=None, y_ranks=None, confidence=0.95):
+    """Correlation coefficient, p-value, confidence interval and sample size for one pair of columns."""
+    valid = ~np.isnan(x) & ~np.isnan(y)
+    n = int(valid.sum())
+    result = {"r": np.nan, "p": np.nan, "ci_low": np.nan, "ci_high": np.nan, "n": n}
+    if n < 3:
+        return result
+
+    if method == "pearson":
+        a, b = x[valid], y[valid]
+    elif x_ranks is not None and y_ranks is not None and (~np.isnan(x)).sum() == n and (~np.isnan(y)).sum() == n:
+        # Both columns are missing in the same rows, so the precomputed ranks are the ranks of the pair
+        a, b = x_ranks[valid], y_ranks[valid]
+    else:
+        a, b = rank_values(x[valid]), rank_values(y[valid])
+
+    if method == "kendall":
+        # Tau-b with scipy's O(n log n) implementation (Knight's algorithm), the ranks are passed as values
+        r, p = stats.kendalltau(a, b)
+    else:
+        with np.errstate(invalid="ignore", divide="ignore"):
+            r = np.corrcoef(a, b)[0, 1]
+            t = r * np.sqrt((n - 2) / max(1 - r ** 2, np.finfo(float).tiny))
+        p = 2 * stats.t.sf(abs(t), n - 2)
+    result["r"], result["p"] = float(r), float(p)
+
+    # Confidence interval via Fisher's z transformation
+    offset = FISHER_SE_OFFSET[method]
+    if n > offset and not np.isnan(r):
+        z = np.arctanh(np.clip(r, -0.999999, 0.999999))
+        se = np.sqrt(FISHER_SE_FACTOR[method] / (n - offset))
+        q = stats.norm.ppf(0.5 + confidence / 2)
+        result["ci_low"], result["ci_high"] = float(np.tanh(z - q * se)), float(np.tanh(z + q * se))
+    return result
+
+
+def correlation_matrix(df, view_version, cols, method):
+    """Correlation matrix plus a table with p-value, confidence interval and n for every pair of columns of the filtered view."""
+    values = {col: numeric_values(df[col]) for col in cols}
+    ranks = {}
+    if method != "pearson":
+        ranks = {col: column_ranks(df, view_version, col) for col in cols}
+    corr = pd.DataFrame(np.eye(len(cols)), index=cols, columns=cols)
+    pairs = []
+    for i, col_a in enumerate(cols):
+        for col_b in cols[i + 1:]:
+            res = correlation_test(values[col_a], values[col_b], method, ranks.get(col_a), ranks.get(col_b))
+            corr.loc[col_a, col_b] = corr.loc[col_b, col_a] = res["r"]
+            pairs.append({"Variable 1": col_a, "Variable 2": col_b, **res})
+    pairs = pd.DataFrame(pairs, columns=["Variable 1", "Variable 2", "r", "p", "ci_low", "ci_high", "n"])
+    return corr, pairs